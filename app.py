@@ -1,22 +1,231 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import io
-import statsmodels.api as sm
+import os
+import tempfile
+import xlsxwriter
+from scipy import stats
+
+# Placeholder values that survive Excel round-trips and should be treated as blanks.
+GHOST_BLANKS = frozenset({'nan', 'None', '', '-', 'NaN', '<NA>'})
 
 # --- PAGE SETUP ---
 st.set_page_config(page_title="Survey Cruncher", layout="wide")
 st.title("📊 Survey Data Cruncher (Version 5.0)")
 st.write("Upload your raw survey data to generate clean tables and run advanced analytics.")
 
+# --- CACHED HELPERS ---
+# Streamlit re-runs this whole script on every widget interaction, so anything
+# expensive (file parsing, the crunch itself) is cached and only re-executed
+# when its inputs actually change.
+
+@st.cache_data(show_spinner=False)
+def load_df(name: str, data: bytes) -> pd.DataFrame:
+    """Parse the uploaded file once per upload, keyed on its name and raw bytes."""
+    buffer = io.BytesIO(data)
+    # Arrow-backed dtypes keep text columns in contiguous buffers instead of
+    # per-cell Python objects, roughly halving memory and speeding up the
+    # string operations in the scrub.
+    if name.endswith('.csv'):
+        # pyarrow's CSV reader is multi-threaded and SIMD-accelerated.
+        return pd.read_csv(buffer, engine='pyarrow', dtype_backend='pyarrow')
+    # calamine parses .xlsx an order of magnitude faster than openpyxl.
+    return pd.read_excel(buffer, engine='calamine', dtype_backend='pyarrow')
+
+
+def _clean_answers(answers):
+    """Trim whitespace and null out ghost blanks in a single Arrow pass.
+
+    Returns a string Series on the same index with invalid answers as NA, so
+    callers can count or drop them without re-scanning. Falls back to pandas
+    ops if the column can't be viewed as Arrow strings (e.g. questions mixing
+    text and numbers).
+    """
+    try:
+        arr = pa.array(answers, from_pandas=True)
+        if not (pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type)):
+            arr = pc.cast(arr, pa.string())
+        trimmed = pc.utf8_trim_whitespace(arr)
+        good = pc.and_kleene(pc.is_valid(arr), pc.invert(pc.is_in(trimmed, value_set=pa.array(sorted(GHOST_BLANKS)))))
+        cleaned = pc.if_else(good, trimmed, pa.scalar(None, type=trimmed.type))
+        return pd.Series(cleaned.to_pandas().to_numpy(), index=answers.index)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        trimmed = answers.astype(str).str.strip()
+        return trimmed.where(answers.notna() & ~trimmed.isin(GHOST_BLANKS))
+
+
+def _has_real_token(answers):
+    """Boolean mask of cells with at least one non-ghost comma-separated token.
+
+    A multi-select cell like "-, -" survives _clean_answers (the full string
+    is not a ghost blank) yet yields zero answers once split, so it must not
+    count toward the question bases.
+    """
+    arr = pa.array(answers, from_pandas=True)
+    if not (pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type)):
+        # An all-null column infers as Arrow null, which split_pattern rejects;
+        # it casts cleanly to all-null strings.
+        arr = pc.cast(arr, pa.string())
+    parts = pc.split_pattern(arr, ',')
+    lens = pc.list_value_length(parts).fill_null(0).to_numpy(zero_copy_only=False)
+    tokens = pc.utf8_trim_whitespace(pc.list_flatten(parts))
+    good = np.asarray(pc.invert(pc.is_in(tokens, value_set=pa.array(sorted(GHOST_BLANKS)))))
+    row_ix = np.repeat(np.arange(len(answers)), lens)
+    return np.bincount(row_ix, weights=good, minlength=len(answers)) > 0
+
+
+@st.cache_data(show_spinner=False)
+def crunch_tables(df, id_col, demo_cols, question_cols, split_multicode):
+    """Scrub the raw data and build the full percentage report."""
+    # Dict-encode the demographics up front so melt replicates small integer
+    # codes instead of strings, and the groupbys run on the fast categorical
+    # path.
+    df = df.astype({col: 'category' for col in demo_cols})
+
+    # Scrub on the wide frame: same total work as scrubbing the melted frame,
+    # but the validity masks and every respondent base can then be computed
+    # per question directly from df, so the long table below never needs to
+    # replicate the id column across questions.
+    for q in question_cols:
+        df[q] = _clean_answers(df[q])
+    if split_multicode:
+        # Null out cells whose every token is a ghost blank, so the bases
+        # below match what the post-split filtering leaves in the long table.
+        for q in question_cols:
+            df[q] = df[q].where(_has_real_token(df[q]))
+    valid = df[question_cols].notna()
+
+    # Collapse the validity masks to one row per respondent (per demographic
+    # value), then reduce: one groupby per demographic covers every question
+    # at once, instead of a separate scan per (question, demographic) pair.
+    # With one row per respondent (the normal case) that collapse is a no-op,
+    # so cheap sums and group sizes replace the per-id hashing entirely.
+    one_row_per_resp = df[id_col].is_unique
+    overall_bases = valid.sum() if one_row_per_resp else valid.groupby(df[id_col]).any().sum()
+    demo_bases_by_col = {}
+    demo_resp_counts = {}
+    for col in demo_cols:
+        if one_row_per_resp:
+            demo_bases_by_col[col] = valid.groupby(df[col], observed=True).sum().T
+            demo_resp_counts[col] = df.groupby(col, observed=True).size()
+        else:
+            resp_valid = valid.groupby([df[col], df[id_col]], observed=True).any()
+            demo_bases_by_col[col] = resp_valid.groupby(level=0, observed=True).sum().T
+            demo_resp_counts[col] = resp_valid.groupby(level=0, observed=True).size()
+
+    if not split_multicode:
+        # No comma-splitting ahead means the scrubbed answers are final, so
+        # give every question column one shared CategoricalDtype: melt then
+        # emits integer-coded answers directly and the long table never holds
+        # a Python string object per cell. Categories follow melt's
+        # column-major order of first appearance, matching the split path.
+        flat = df[question_cols].to_numpy().ravel(order='F')
+        answer_dtype = pd.CategoricalDtype(pd.unique(flat[pd.notna(flat)]), ordered=True)
+        df = df.astype({q: answer_dtype for q in question_cols})
+
+    long_data = pd.melt(df, id_vars=demo_cols, value_vars=question_cols, var_name='Question', value_name='Answer')
+    long_data['Question'] = pd.Categorical(long_data['Question'], categories=question_cols, ordered=True)
+    long_data = long_data.dropna(subset=['Answer'])
+
+    if split_multicode:
+        # Arrow's split/flatten/trim/is_in are single C kernels over one
+        # contiguous string buffer, so the whole split-strip-filter sequence
+        # runs without allocating a Python list or string per cell.
+        arr = pa.array(long_data['Answer'], from_pandas=True)
+        if not (pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type)):
+            # An empty frame infers as Arrow null, which split_pattern rejects.
+            arr = pc.cast(arr, pa.string())
+        parts = pc.split_pattern(arr, ',')
+        lens = pc.list_value_length(parts).to_numpy()
+        flat = pc.utf8_trim_whitespace(pc.list_flatten(parts))
+        mask = pc.invert(pc.is_in(flat, value_set=pa.array(sorted(GHOST_BLANKS))))
+        row_ix = np.repeat(np.arange(len(long_data)), lens)[np.asarray(mask)]
+        long_data = long_data.iloc[row_ix].assign(Answer=np.asarray(flat.filter(mask)))
+
+        unique_answers = long_data['Answer'].unique().tolist()
+        long_data['Answer'] = pd.Categorical(long_data['Answer'], categories=unique_answers, ordered=True)
+
+    # groupby().size().unstack() is what crosstab does internally, minus its
+    # dtype inference and column munging; with all three keys Categorical the
+    # groupby stays on the integer-code fast path.
+    overall = long_data.groupby(['Question', 'Answer'], observed=True).size().to_frame('Overall %')
+    overall_pct = overall.div(overall_bases, level='Question', axis=0) * 100
+
+    # Every observed (Question, Answer) pair appears in the overall counts, so
+    # its index is the natural shared row index. Reindexing each demographic
+    # table to it up front means the final concat sees identical indices and
+    # skips the outer-join alignment (and the whole-report fillna) entirely.
+    master_idx = overall_pct.index
+    tables_to_join = [overall_pct]
+
+    for col in demo_cols:
+        demo_tab = long_data.groupby(['Question', 'Answer', col], observed=True).size().unstack(col, fill_value=0)
+        demo_tab = demo_tab.reindex(master_idx, fill_value=0)
+        demo_pct = (demo_tab.div(demo_bases_by_col[col], level='Question', axis=0) * 100).fillna(0)
+        # Vectorized Index concatenation, not a Python f-string per category.
+        demo_pct.columns = f"{col}: " + demo_pct.columns.astype(str)
+        tables_to_join.append(demo_pct)
+
+    final_report = pd.concat(tables_to_join, axis=1).round(1)
+
+    total_base = len(df) if one_row_per_resp else df[id_col].nunique()
+    base_parts = [pd.Series({'Overall %': total_base})]
+    for col in demo_cols:
+        counts = demo_resp_counts[col]
+        counts.index = f"{col}: " + counts.index.astype(str)
+        base_parts.append(counts)
+
+    # The groupbys already emit rows in Question/Answer category order, so the
+    # old re-categorize + sort_values + astype(str) round-trip over the whole
+    # report is redundant; the base row just needs to be prepended in place.
+    base_series = pd.concat(base_parts).reindex(final_report.columns, fill_value=0)
+    report_idx = pd.MultiIndex.from_tuples(
+        [("BASE SIZE", "Total Survey Participants (n)")], names=['Question', 'Answer']
+    ).append(final_report.index)
+    values = np.vstack([base_series.to_numpy(), final_report.to_numpy()])
+    final_report = pd.DataFrame(values, index=report_idx, columns=final_report.columns).reset_index()
+
+    # Blank out repeated question labels for readability. The column is sorted,
+    # so a shifted equality compare finds the repeats without duplicated()'s
+    # hash pass.
+    labels = final_report['Question'].to_numpy()
+    repeated = np.zeros(len(labels), dtype=bool)
+    repeated[1:] = labels[1:] == labels[:-1]
+    final_report.loc[repeated, 'Question'] = ""
+
+    return final_report
+
+
+@st.cache_data(show_spinner=False)
+def to_xlsx(final_report: pd.DataFrame) -> bytes:
+    """Serialize the report to .xlsx, cached on the report so the (often
+    crunch-sized) export cost is paid once per result rather than per rerun."""
+    # Write straight to a temp file with xlsxwriter in constant_memory mode:
+    # rows are flushed to disk as they are written, so the export never holds
+    # both a BytesIO workbook and its getvalue() copy in memory at once. A
+    # path inside a TemporaryDirectory (rather than an open NamedTemporaryFile
+    # reopened by name) keeps this working on Windows too.
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = os.path.join(tmp_dir, 'Clean_Survey_Results.xlsx')
+        workbook = xlsxwriter.Workbook(tmp_path, {'constant_memory': True})
+        sheet = workbook.add_worksheet('Survey Results')
+        sheet.write_row(0, 0, final_report.columns)
+        for i, row in enumerate(final_report.itertuples(index=False), start=1):
+            sheet.write_row(i, 0, row)
+        workbook.close()
+        with open(tmp_path, 'rb') as fh:
+            return fh.read()
+
+
 # --- FILE UPLOAD ---
 uploaded_file = st.file_uploader("Upload Raw Survey Data (Excel or CSV)", type=["xlsx", "csv"])
 
 if uploaded_file is not None:
-    if uploaded_file.name.endswith('.csv'):
-        df = pd.read_csv(uploaded_file)
-    else:
-        df = pd.read_excel(uploaded_file)
-        
+    df = load_df(uploaded_file.name, uploaded_file.getvalue())
+
     st.success("File uploaded successfully!")
     
     st.write(f"**Total Respondents:** {df.shape[0]}")
@@ -54,65 +263,12 @@ if uploaded_file is not None:
                 st.warning("⚠️ Please select at least one demographic and one question column above.")
             else:
                 with st.spinner("Scrubbing data and calculating percentages..."):
-                    long_data = pd.melt(df, id_vars=[id_col] + demo_cols, value_vars=question_cols, var_name='Question', value_name='Answer')
-                    
-                    long_data = long_data.dropna(subset=['Answer'])
-                    long_data['Question'] = long_data['Question'].astype(str)
-                    long_data['Answer'] = long_data['Answer'].astype(str).str.strip()
-                    
-                    ghost_blanks = ['nan', 'None', '', '-', 'NaN', '<NA>']
-                    long_data = long_data[~long_data['Answer'].isin(ghost_blanks)]
-
-                    if split_multicode:
-                        long_data['Answer'] = long_data['Answer'].str.split(',')
-                        long_data = long_data.explode('Answer')
-                        long_data['Answer'] = long_data['Answer'].str.strip()
-                        long_data = long_data[~long_data['Answer'].isin(ghost_blanks)]
-                    
-                    long_data['Question'] = pd.Categorical(long_data['Question'], categories=question_cols, ordered=True)
-                    unique_answers = long_data['Answer'].unique().tolist()
-                    long_data['Answer'] = pd.Categorical(long_data['Answer'], categories=unique_answers, ordered=True)
+                    final_report = crunch_tables(df, id_col, demo_cols, question_cols, split_multicode)
 
-                    tables_to_join = []
-                    
-                    overall = pd.crosstab(index=[long_data['Question'], long_data['Answer']], columns='Overall %', dropna=True)
-                    overall_bases = long_data.groupby('Question', observed=True)[id_col].nunique()
-                    overall_pct = overall.div(overall_bases, level='Question', axis=0) * 100
-                    tables_to_join.append(overall_pct)
-                    
-                    for col in demo_cols:
-                        demo_tab = pd.crosstab(index=[long_data['Question'], long_data['Answer']], columns=long_data[col], dropna=True)
-                        demo_bases = long_data.groupby(['Question', col], observed=True)[id_col].nunique().unstack(level=col)
-                        demo_pct = demo_tab.div(demo_bases, level='Question', axis=0) * 100
-                        demo_pct.columns = [f"{col}: {str(c)}" for c in demo_pct.columns]
-                        tables_to_join.append(demo_pct)
-                        
-                    final_report = pd.concat(tables_to_join, axis=1).fillna(0).round(1)
-                    
-                    base_sizes = {'Overall %': df[id_col].nunique()}
-                    for col in demo_cols:
-                        counts = df.groupby(col)[id_col].nunique()
-                        for cat, count in counts.items():
-                            base_sizes[f"{col}: {str(cat)}"] = count
-                            
-                    base_index = pd.MultiIndex.from_tuples([("BASE SIZE", "Total Survey Participants (n)")], names=['Question', 'Answer'])
-                    base_df = pd.DataFrame([base_sizes], index=base_index)
-                    
-                    final_report = pd.concat([base_df, final_report]).fillna(0).reset_index()
-                    
-                    final_report['Question'] = pd.Categorical(final_report['Question'], categories=(['BASE SIZE'] + question_cols), ordered=True)
-                    final_report = final_report.sort_values(['Question'])
-                    final_report['Question'] = final_report['Question'].astype(str)
-                    final_report.loc[final_report['Question'].duplicated(), 'Question'] = ""
-                    
                     st.success("✨ Cross-Tabs Complete!")
                     st.dataframe(final_report)
-                    
-                    excel_buffer = io.BytesIO()
-                    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                        final_report.to_excel(writer, sheet_name='Survey Results', index=False)
-                    
-                    st.download_button("📥 Download Cross-Tabs to Excel", data=excel_buffer.getvalue(), file_name="Clean_Survey_Results.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+                    st.download_button("📥 Download Cross-Tabs to Excel", data=to_xlsx(final_report), file_name="Clean_Survey_Results.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 
     # ==========================================
@@ -140,10 +296,11 @@ if uploaded_file is not None:
                         "Strongly Agree": 5, "Strongly Disagree": 1 # Catching capitalization differences
                     }
                     
-                    # Apply the mapping to turn text into numbers
-                    for col in reg_data.columns:
-                        reg_data[col] = reg_data[col].map(lambda x: scale_mapping.get(str(x).strip(), pd.NA))
-                        
+                    # Apply the mapping to turn text into numbers. Mapping the whole
+                    # column against the dict runs in C, instead of calling a Python
+                    # lambda once per cell.
+                    reg_data = reg_data.apply(lambda s: s.astype('string').str.strip().map(scale_mapping)).astype('Int64')
+
                     # 3. Drop missing data (Regression requires full rows)
                     clean_reg_data = reg_data.dropna()
                     
@@ -153,22 +310,30 @@ if uploaded_file is not None:
                         st.error("🚨 Not enough valid numerical data to run a regression. Ensure your selected questions use a 5-point agree/disagree scale.")
                     else:
                         # 4. Run the Math
-                        Y = clean_reg_data[target_col].astype(float)
-                        X = clean_reg_data[driver_cols].astype(float)
-                        X = sm.add_constant(X) # Required for OLS regression
-                        
-                        model = sm.OLS(Y, X).fit()
-                        
-                        # 5. Format the Results
+                        Y = clean_reg_data[target_col].astype(float).to_numpy()
+                        X = clean_reg_data[driver_cols].astype(float).to_numpy()
+                        X = np.column_stack([np.ones(len(X)), X]) # Intercept column, required for OLS regression
+
+                        # The table only shows coefficients and p-values, so solve the
+                        # least-squares system directly rather than building a full
+                        # statsmodels results object with its diagnostics suite. pinv
+                        # (like statsmodels) tolerates constant or collinear drivers,
+                        # where a plain inverse would raise on the singular matrix.
+                        beta, *_ = np.linalg.lstsq(X, Y, rcond=None)
+                        resid = Y - X @ beta
+                        dof = len(Y) - X.shape[1]
+                        sigma2 = (resid @ resid) / dof
+                        se = np.sqrt(np.diag(sigma2 * np.linalg.pinv(X.T @ X)))
+                        with np.errstate(divide='ignore', invalid='ignore'):
+                            p_values = 2 * stats.t.sf(np.abs(beta / se), dof)
+
+                        # 5. Format the Results (row 0 is the intercept, which we don't show)
                         results_df = pd.DataFrame({
-                            "Driver Question": model.params.index,
-                            "Impact Score (Coefficient)": model.params.values.round(3),
-                            "P-Value": model.pvalues.values.round(4)
+                            "Driver Question": driver_cols,
+                            "Impact Score (Coefficient)": beta[1:].round(3),
+                            "P-Value": p_values[1:].round(4)
                         })
-                        
-                        # Remove the 'const' baseline row
-                        results_df = results_df[results_df["Driver Question"] != "const"]
-                        
+
                         # Calculate Statistical Significance
                         results_df["Significant?"] = results_df["P-Value"].apply(lambda x: "✅ Yes" if x < 0.05 else "❌ No")
                         